@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
+import os
+import re
 import time
+import subprocess
+import traceback
+from collections import deque
 from pathlib import Path
-from utils import safe_read, safe_write, safe_shell
+from concurrent.futures import ThreadPoolExecutor
+from utils import safe_read, safe_write, safe_shell, logger
 
 ########################################
 # 동적 경로 설정
@@ -12,9 +18,56 @@ BASE_DIR = Path(__file__).resolve().parent
 PATTERNS = BASE_DIR / "patterns.json"
 REPORT = BASE_DIR / "boot_report.json"
 
+# dmesg 에서 OOM 흔적을 찾는 패턴 (grep -i 'out of memory' 대체)
+OOM_RE = re.compile(rb"out of memory", re.I)
+OOM_TAIL = 5
+
 ########################################
 # 핵심 점검 함수
 ########################################
+def shell_stdout(cmd):
+    # safe_shell 실패(timeout 등) 시 None 반환
+    proc = safe_shell(cmd)
+    return proc.stdout if proc else ""
+
+
+def swap_info():
+    # swapon --show 대신 커널이 제공하는 /proc/swaps 를 직접 읽음
+    try:
+        return Path("/proc/swaps").read_text()
+    except OSError:
+        logger.error(f"READ_FAIL /proc/swaps\n{traceback.format_exc()}")
+        return ""
+
+
+def disk_usage(path="/"):
+    # df -h 대신 statvfs 로 직접 조회 (단위: byte)
+    st = os.statvfs(path)
+    return {
+        "path": path,
+        "total": st.f_blocks * st.f_frsize,
+        "used": (st.f_blocks - st.f_bfree) * st.f_frsize,
+        "free": st.f_bavail * st.f_frsize
+    }
+
+
+def recent_oom():
+    # dmesg | grep | tail 파이프라인 대신 dmesg 한 번만 실행 후 직접 필터링
+    try:
+        proc = subprocess.run(["dmesg"], capture_output=True, timeout=30)
+    except Exception:
+        logger.error(f"SHELL_FAIL dmesg\n{traceback.format_exc()}")
+        return ""
+
+    tail = deque(
+        (line for line in proc.stdout.splitlines() if OOM_RE.search(line)),
+        maxlen=OOM_TAIL
+    )
+    if not tail:
+        return ""
+    return b"\n".join(tail).decode("utf-8", "replace") + "\n"
+
+
 def run_checks(patterns):
     result = {
         "timestamp": time.time(),
@@ -22,20 +75,38 @@ def run_checks(patterns):
         "checks": {}
     }
 
+    # (check, key, func, args) — key 가 있으면 check 아래 dict 로 묶음
+    probes = []
+
     # Out Of Memory 기록 확인
     if "OOM" in patterns:
-        result["checks"]["OOM"] = {
-            "swap": safe_shell("swapon --show").stdout,
-            "recent": safe_shell("dmesg | grep -i 'out of memory' | tail -5").stdout
-        }
+        result["checks"]["OOM"] = {}
+        probes.append(("OOM", "swap", swap_info, ()))
+        probes.append(("OOM", "recent", recent_oom, ()))
 
     # 디스크 용량 점검
     if "DISK" in patterns:
-        result["checks"]["DISK"] = safe_shell("df -h /").stdout
+        probes.append(("DISK", None, disk_usage, ("/",)))
 
     # 실패한 서비스 확인
     if "SERVICE" in patterns:
-        result["checks"]["SERVICE"] = safe_shell("systemctl --failed").stdout
+        probes.append(("SERVICE", None, shell_stdout, (["systemctl", "--failed"],)))
+
+    if not probes:
+        return result
+
+    # 점검 명령은 서로 독립적 → 동시에 실행 (총 소요 = 가장 느린 명령)
+    # 결과는 제출 순서대로 모아 JSON 키 순서를 기존과 동일하게 유지
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        futures = [
+            (check, key, ex.submit(func, *args))
+            for check, key, func, args in probes
+        ]
+        for check, key, fut in futures:
+            if key:
+                result["checks"][check][key] = fut.result()
+            else:
+                result["checks"][check] = fut.result()
 
     return result
 
@@ -50,4 +121,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -9,7 +9,10 @@ MCP_DIR="$SCRIPT_DIR"
 VENV_DIR="$MCP_DIR/mcp-venv"
 LOG_FILE="$MCP_DIR/error.log"
 STATE_FILE="$MCP_DIR/state.json"
+CLASSIFY_CACHE_FILE="$MCP_DIR/classify_cache.json"
+HISTORY_FILE="$MCP_DIR/.history"
 SERVICE_FILE="/etc/systemd/system/mcp.service"
+LOGROTATE_FILE="/etc/logrotate.d/mcp"
 ENV_FILE="/etc/mcp.env"
 
 echo "======================================"
@@ -68,8 +71,8 @@ fi
 ########################################
 echo "[4/7] Removing logs & state..."
 
-rm -f "$LOG_FILE" "$STATE_FILE"
-echo " - Deleted: error.log / state.json (if existed)"
+rm -f "$LOG_FILE" "$LOG_FILE".[0-9] "$STATE_FILE" "$CLASSIFY_CACHE_FILE" "$HISTORY_FILE" "$LOGROTATE_FILE"
+echo " - Deleted: error.log / state.json / classify_cache.json / .history / logrotate config (if existed)"
 
 ########################################
 # 환경 변수 파일 삭제 (/etc/mcp.env)
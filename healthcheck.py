@@ -10,9 +10,21 @@ from utils import safe_read
 BASE_DIR = Path(__file__).resolve().parent
 STATE = BASE_DIR / "state.json"
 
+# heartbeat 허용 지연 (초)
+HEARTBEAT_TIMEOUT = 30
+
 ########################################
 # Health Check
 ########################################
+try:
+    st = STATE.stat()
+except OSError:
+    sys.exit(1)
+
+# 파일 자체가 30초 이상 갱신되지 않았으면 내용도 오래된 것 → 파싱 없이 FAIL
+if time.time() - st.st_mtime > HEARTBEAT_TIMEOUT:
+    sys.exit(1)
+
 data = safe_read(STATE, {})
 
 # 파일 자체가 없거나 JSON 구조가 잘못됨
@@ -20,7 +32,7 @@ if not data or "last_heartbeat" not in data:
     sys.exit(1)
 
 # 30초 이상 heartbeat 없으면 FAIL
-if time.time() - data["last_heartbeat"] > 30:
+if time.time() - data["last_heartbeat"] > HEARTBEAT_TIMEOUT:
     sys.exit(1)
 
 # 정상
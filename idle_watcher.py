@@ -17,6 +17,9 @@ STATE = MCP_DIR / "state.json"
 ########################################
 IDLE_LIMIT = int(os.environ.get("MCP_IDLE_LIMIT", 1800))
 
+# heartbeat 기록이 아직 없을 때의 재확인 주기
+POLL_INTERVAL = 60
+
 SERVICE = "mcp"
 
 while True:
@@ -24,12 +27,19 @@ while True:
         data = safe_read(STATE, {})
         last = data.get("last_heartbeat", 0)
 
-        if last and (time.time() - last) > IDLE_LIMIT:
-            safe_shell(f"systemctl stop {SERVICE}")
+        if not last:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        idle = time.time() - last
+        if idle > IDLE_LIMIT:
+            safe_shell(["systemctl", "stop", SERVICE])
             break
 
-        time.sleep(60)
+        # heartbeat 는 앞으로만 갱신되므로 만료 시점까지 한 번에 대기
+        # (그 사이 갱신되었다면 깨어나서 새 만료 시점으로 다시 대기)
+        time.sleep(max(IDLE_LIMIT - idle, 1))
 
     except Exception:
         # 어떤 에러도 watcher가 죽지 않도록
-        time.sleep(60)
\ No newline at end of file
+        time.sleep(POLL_INTERVAL)
\ No newline at end of file
@@ -2,6 +2,8 @@
 import os
 import json
 import subprocess
+import shlex
+import selectors
 import argparse
 import traceback
 import sys
@@ -9,9 +11,16 @@ import re
 import time
 import signal
 import logging
+from logging.handlers import WatchedFileHandler, QueueHandler, QueueListener
+import queue
+import atexit
+import threading
+import hashlib
+import importlib.util
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
-from ollama import Client
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
 
 ########################################
 # Paths
@@ -19,6 +28,7 @@ from ollama import Client
 BASE_DIR = Path(__file__).resolve().parent
 PROMPT_DIR = BASE_DIR / "prompts"
 LOG_FILE = BASE_DIR / "error.log"
+HISTORY_FILE = BASE_DIR / ".history"
 ENV_FILE = "/etc/mcp.env"
 
 ########################################
@@ -30,15 +40,23 @@ logger = logging.getLogger("MCP")
 logger.setLevel(logging.INFO)
 
 # 🔹 UI로 출력되지 않는 File Logger
-file_handler = logging.FileHandler(LOG_FILE)
+# 서비스/CLI 등 여러 프로세스가 같은 파일에 append → 순환은 외부(logrotate)에서
+# WatchedFileHandler 는 파일이 교체되면 다시 열어 새 파일에 기록
+file_handler = WatchedFileHandler(LOG_FILE)
 file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(logging.Formatter(
     '%(asctime)s [%(levelname)s] %(message)s'
 ))
 
 # ❗ stdout handler 제거 = UI 로그 사라짐
+# 파일 쓰기는 백그라운드 스레드(QueueListener)가 담당 → 요청 처리 스레드는 큐에 넣기만 함
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, file_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logger.handlers.clear()
-logger.addHandler(file_handler)
+logger.addHandler(QueueHandler(log_queue))
 
 ########################################
 # Models
@@ -54,39 +72,143 @@ MODEL_CHAINS = {
 
 CONFIDENCE_THRESHOLD = 0.6
 
+# 모델 응답 대기 최대 시간 (초) — 멈춘 모델이 fallback 체인 전체를 막지 않도록
+LLM_TIMEOUT = float(os.environ.get("MCP_LLM_TIMEOUT", 120))
+
+# 연결 수립 대기 최대 시간 (초) — 서버에 닿지 않으면 응답 대기 시간까지 기다리지 않음
+LLM_CONNECT_TIMEOUT = 5
+
+# 유휴 연결 유지 — 기본값(5초)이면 CLI 에서 다음 요청을 입력하는 사이 연결이 끊겨
+# 요청마다 TLS 연결을 새로 맺게 됨
+LLM_KEEPALIVE_CONNECTIONS = 8
+LLM_KEEPALIVE_EXPIRY = 60
+
+# 모델 응답 최대 크기 (글자 수) — 넘으면 비정상 응답으로 보고 다음 모델로 넘김
+MAX_RESPONSE_CHARS = 256 * 1024
+
+# JSON 이 닫힌 뒤 더 읽을 chunk 수 — 보통은 마지막 done chunk 하나로 끝나
+# 연결이 pool 로 돌아감, 그 이상 이어지면 기다리지 않고 스트림을 닫음
+STREAM_DRAIN_CHUNKS = 4
+
+# 비실행(REPORT) 경로에서는 체인 상위 2개 모델에 hedged 요청 후 먼저 성공한 응답 사용
+# 요청 한도가 빠듯할 때는 MCP_SPECULATIVE=0 으로 끌 수 있음
+SPECULATIVE = os.environ.get("MCP_SPECULATIVE", "1") != "0"
+
+# 실행 계획은 같은 요청이면 같은 모델이 만들도록 기본은 순차 호출
+# MCP_HEDGED_FALLBACK=1 이면 실행 계획도 hedged 요청 (응답 지연 우선)
+HEDGED_FALLBACK = os.environ.get("MCP_HEDGED_FALLBACK", "0") == "1"
+
+# hedged 요청: 1순위 모델이 이 시간(초) 안에 응답하지 않으면 2순위 모델도 호출
+# (1순위가 먼저 실패하면 즉시 2순위 호출)
+HEDGE_DELAY = float(os.environ.get("MCP_HEDGE_DELAY", 1.5))
+
+# parallel 실행 계획의 최대 동시 실행 명령 수 (MCP_EXEC_CONCURRENCY 로 변경 가능)
+EXEC_CONCURRENCY = max(1, int(os.environ.get("MCP_EXEC_CONCURRENCY", 4)))
+
+# 명령 1개당 최대 실행 시간 (초)
+EXEC_TIMEOUT = 90
+
+# 명령 1개당 결과에 담을 stdout/stderr 최대 크기 (byte)
+MAX_OUTPUT_BYTES = 1 << 20
+
+# --batch 모드에서 계획/보고서를 동시에 생성할 최대 요청 수
+BATCH_WORKERS = 4
+
+# Classifier 호출과 동시에 지정한 카테고리 체인으로 실행계획을 미리 요청
+# 분류 결과가 같은 체인이면 그대로 사용, 아니면 버림 (요청 비용 증가 → 기본 off)
+# 예: MCP_SPECULATIVE_PLAN=server_operation
+# (explanatory 는 실행계획 대신 보고서를 만들므로 대상 아님)
+SPECULATIVE_PLAN = os.environ.get("MCP_SPECULATIVE_PLAN")
+if SPECULATIVE_PLAN not in MODEL_CHAINS or SPECULATIVE_PLAN == "explanatory":
+    SPECULATIVE_PLAN = None
+
 
 ########################################
 # ENV LOAD
 ########################################
+# KEY=VALUE 한 줄 (주석 줄 제외)
+ENV_RE = re.compile(rb"(?m)^[ \t]*([^#=\s]+)[ \t]*=[ \t]*(.*?)[ \t]*\r?$")
+
+
 def ensure_env_loaded():
     if os.environ.get("OLLAMA_API_KEY"):
         return
-    if not os.path.exists(ENV_FILE):
+    try:
+        data = Path(ENV_FILE).read_bytes()
+    except FileNotFoundError:
         return
-    with open(ENV_FILE) as f:
-        for line in f:
-            if "=" in line and not line.strip().startswith("#"):
-                k, v = line.strip().split("=", 1)
-                os.environ.setdefault(k, v.strip().strip('"').strip("'"))
+
+    # 이미 설정된 환경변수는 덮어쓰지 않음
+    os.environ.update({
+        k.decode(): v.decode().strip('"').strip("'")
+        for k, v in ENV_RE.findall(data)
+        if k.decode() not in os.environ
+    })
 
 
 ########################################
 # OLLAMA CLIENT
 ########################################
+# 프로세스 전체에서 하나의 Client(= 하나의 HTTP keep-alive 커넥션 풀)를 재사용
+# h2 패키지가 있으면 HTTP/2 로 하나의 커넥션에서 동시 요청을 다중화
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+_CLIENT = None
+_CLIENT_KEY = None
+_CLIENT_LOCK = threading.Lock()
+
+
 def ollama_client():
-    return Client(
-        host="https://ollama.com",
-        headers={"Authorization": f"Bearer {os.environ.get('OLLAMA_API_KEY')}"}
-    )
+    global _CLIENT, _CLIENT_KEY
+
+    api_key = os.environ.get("OLLAMA_API_KEY")
+
+    with _CLIENT_LOCK:
+        # API KEY 가 바뀐 경우에만 새로 생성
+        if _CLIENT is None or _CLIENT_KEY != api_key:
+            # ollama(httpx, pydantic) 는 첫 요청 시점에 import
+            # → 대기만 하는 서비스 모드의 기동 시간/메모리 절약
+            import httpx
+            from ollama import Client
+
+            _CLIENT = Client(
+                host="https://ollama.com",
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                ),
+                http2=HTTP2
+            )
+            _CLIENT_KEY = api_key
+        return _CLIENT
 
 
 ########################################
 # PROMPT LOADER
 ########################################
+# 파일명 → (mtime_ns, 내용) — 파일이 수정된 경우에만 다시 읽음
+# 시스템 프롬프트는 항상 messages[0] 에 그대로(요청 내용을 섞지 않고) 넣음
+# → 호출마다 앞부분이 byte 단위로 같아 서버 측 프롬프트 캐시가 적중함
+_PROMPT_CACHE = {}
+
+
 def load_prompt(name):
     path = PROMPT_DIR / name
     try:
-        return path.read_text(encoding="utf-8")
+        mtime = path.stat().st_mtime_ns
+        cached = _PROMPT_CACHE.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        text = path.read_text(encoding="utf-8")
+        _PROMPT_CACHE[name] = (mtime, text)
+
+        # 내용이 바뀌면 해시도 바뀜 → 로그로 프롬프트 캐시 무효화 시점 확인
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+        logger.info(f"프롬프트 로드: {name} ({digest})")
+        return text
     except Exception as e:
         logger.error(f"❌ 프롬프트 로드 실패: {name} — {e}")
         return ""
@@ -95,10 +217,17 @@ def load_prompt(name):
 ########################################
 # SAFE JSON PARSE
 ########################################
+FENCE_RE = re.compile(r"```(?:json)?")
+
+
 def safe_json(text, default=None):
+    # format="json" 응답은 대부분 그대로 파싱 가능 → 실패할 때만 코드펜스 제거
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
     try:
-        clean = re.sub(r"```json|```", "", text).strip()
-        return json.loads(clean)
+        return json.loads(FENCE_RE.sub("", text).strip())
     except Exception:
         return default
 
@@ -113,27 +242,175 @@ def step(msg):
 ########################################
 # MODEL CALL WITH FALLBACK
 ########################################
-def call_with_fallback(models, system_prompt, user_payload):
+def read_json_stream(chunks, cancel=None):
+    """
+    스트리밍 응답을 이어 붙이다가 최상위 JSON 이 닫히면 내용 수집 종료
+    닫힌 뒤의 chunk 는 STREAM_DRAIN_CHUNKS 개까지만 읽고 버림
+    → 보통은 done chunk 까지 받아 연결이 keep-alive pool 로 돌아가고,
+      모델이 계속 출력하면 기다리지 않고 닫음 (그 연결만 버려짐)
+    크기 제한/cancel 은 JSON 이 닫히기 전까지만 적용
+    cancel: set 되면 수신을 중단하고 스트림을 닫음 (결과가 필요 없어진 호출)
+    """
+    buf = []
+    size = 0
+    depth = 0
+    in_str = escaped = False
+    closed = False
+    drained = 0
+
+    try:
+        for part in chunks:
+            # JSON 이 닫힌 뒤에는 무엇이 와도(공백 폭주 등) 호출을 실패시키지 않음
+            if closed:
+                drained += 1
+                if drained > STREAM_DRAIN_CHUNKS:
+                    close = getattr(chunks, "close", None)
+                    if close:
+                        close()
+                    break
+                continue
+
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("호출 취소")
+
+            text = part["message"]["content"]
+
+            size += len(text)
+            if size > MAX_RESPONSE_CHARS:
+                raise ValueError(f"응답 크기 초과 ({MAX_RESPONSE_CHARS}자)")
+
+            for i, ch in enumerate(text):
+                if in_str:
+                    if escaped:
+                        escaped = False
+                    elif ch == "\\":
+                        escaped = True
+                    elif ch == '"':
+                        in_str = False
+                elif ch == '"':
+                    in_str = True
+                elif ch in "{[":
+                    depth += 1
+                elif ch in "}]":
+                    depth -= 1
+                    if depth == 0:
+                        buf.append(text[:i + 1])
+                        closed = True
+                        break
+            else:
+                buf.append(text)
+    except BaseException:
+        # 비정상 종료(크기 초과, 취소 등) 시에만 스트림을 바로 닫음
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+        raise
+
+    return "".join(buf)
+
+
+def chat_json(client, model, system_prompt, user_content, validator=None, cancel=None):
+    chunks = client.chat(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ],
+        format="json",
+        stream=True
+    )
+    result = safe_json(read_json_stream(chunks, cancel), {})
+
+    # 형식이 맞지 않는 응답은 실패로 보고 다음 모델로 넘김
+    if validator is not None and not validator(result):
+        raise ValueError(f"{model} 응답 형식 오류")
+
+    return result
+
+
+def spawn(fn, *args):
+    """
+    fn 을 daemon 스레드에서 실행하고 Future 반환
+    ThreadPoolExecutor 작업 스레드는 프로세스 종료 시 끝날 때까지 기다리므로,
+    결과를 버린 호출이 종료를 막지 않도록 daemon 스레드 사용
+    """
+    fut = Future()
+
+    def run():
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return fut
+
+
+def call_with_fallback(models, system_prompt, user_payload, speculative=False, validator=None,
+                       cancel=None, quiet=False):
+    """
+    cancel: set 되면 진행 중인 호출을 닫고 남은 모델도 호출하지 않음
+    quiet: 진행 상황(step)을 출력하지 않음 (결과를 버릴 수도 있는 미리 요청용)
+    """
     client = ollama_client()
     last_error = None
+    say = (lambda msg: None) if quiet else step
+
+    # 모델이 바뀌어도 요청 내용은 같으므로 한 번만 직렬화 (공백 없는 compact 형식)
+    user_content = json.dumps(user_payload, ensure_ascii=False, separators=(",", ":"))
+
+    if speculative and len(models) > 1:
+        head, models = list(models[:2]), models[2:]
+
+        # 1순위 모델부터 호출, HEDGE_DELAY 안에 끝나지 않거나 실패하면 2순위도 호출
+        # 먼저 성공한 응답을 사용, 남은 호출은 취소 (대기하지 않음)
+        if cancel is None:
+            cancel = threading.Event()
+        pending = {}
+
+        try:
+            while head or pending:
+                if head:
+                    m = head.pop(0)
+                    say(f"모델 호출: {m}")
+                    fut = spawn(chat_json, client, m, system_prompt, user_content, validator, cancel)
+                    pending[fut] = m
+
+                done, _ = wait(
+                    pending,
+                    timeout=HEDGE_DELAY if head else None,
+                    return_when=FIRST_COMPLETED
+                )
+
+                for fut in done:
+                    m = pending.pop(fut)
+                    try:
+                        return fut.result()
+                    except Exception as e:
+                        last_error = str(e)
+                        logger.error(traceback.format_exc())
+                        say(f"⚠️ {m} 호출 실패")
+        finally:
+            # 아직 응답 중인 호출은 다음 chunk 에서 스트림을 닫고 종료
+            # (남은 호출이 있을 때 = 이 함수를 빠져나가는 경우에만)
+            if pending:
+                cancel.set()
+
+        if models:
+            say("⚠️ 동시 호출 모두 실패 — 다음 모델로 대체 시도")
 
     for m in models:
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("호출 취소")
         try:
-            step(f"모델 호출: {m}")
-            resp = client.chat(
-                model=m,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": json.dumps(user_payload, ensure_ascii=False)}
-                ],
-                format="json",
-                stream=False
-            )
-            return safe_json(resp["message"]["content"], {})
+            say(f"모델 호출: {m}")
+            return chat_json(client, m, system_prompt, user_content, validator, cancel)
         except Exception as e:
             last_error = str(e)
             logger.error(traceback.format_exc())
-            step(f"⚠️ {m} 호출 실패 — 다음 모델로 대체 시도")
+            say(f"⚠️ {m} 호출 실패 — 다음 모델로 대체 시도")
 
     raise RuntimeError(last_error)
 
@@ -141,7 +418,132 @@ def call_with_fallback(models, system_prompt, user_payload):
 ########################################
 # CLASSIFIER
 ########################################
+# 분류 결과 LRU 캐시 — 원문 대신 16바이트 해시를 키로 사용 (메모리 상한 고정)
+# 재시작 후에도 재사용할 수 있도록 파일에 보관, CLASSIFY_CACHE_TTL 이 지나면 다시 분류
+# 항목: key → (저장 시각, 분류 결과)
+CLASSIFY_CACHE_SIZE = 512
+CLASSIFY_CACHE_TTL = 7 * 24 * 3600
+CLASSIFY_CACHE_FILE = BASE_DIR / "classify_cache.json"
+_CLASSIFY_CACHE = OrderedDict()
+_CLASSIFY_CACHE_LOADED = False
+
+
+def load_classify_cache():
+    global _CLASSIFY_CACHE_LOADED
+    if _CLASSIFY_CACHE_LOADED:
+        return
+    _CLASSIFY_CACHE_LOADED = True
+
+    # 파일이 없거나 깨졌거나 형식이 다르면 빈 캐시로 시작
+    try:
+        data = json.loads(CLASSIFY_CACHE_FILE.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("최상위가 객체가 아님")
+
+        # 파일에는 오래된 것 → 최근 것 순서로 저장됨 ([저장 시각, 분류 결과])
+        now = time.time()
+        for k, v in list(data.items())[-CLASSIFY_CACHE_SIZE:]:
+            if (isinstance(v, list) and len(v) == 2
+                    and isinstance(v[0], (int, float)) and isinstance(v[1], dict)
+                    and now - v[0] < CLASSIFY_CACHE_TTL):
+                _CLASSIFY_CACHE[bytes.fromhex(k)] = (v[0], v[1])
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        _CLASSIFY_CACHE.clear()
+        logger.error(f"분류 캐시 로드 실패 — {e}")
+
+
+def save_classify_cache():
+    # 임시 파일에 쓴 뒤 교체 → 중간에 죽어도 깨진 파일이 남지 않음
+    tmp = CLASSIFY_CACHE_FILE.with_suffix(".tmp")
+    try:
+        tmp.write_text(
+            json.dumps({k.hex(): list(v) for k, v in _CLASSIFY_CACHE.items()}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+        os.replace(tmp, CLASSIFY_CACHE_FILE)
+    except Exception as e:
+        logger.error(f"분류 캐시 저장 실패 — {e}")
+
+
+def classify_key(user_text):
+    # 공백/대소문자만 다른 요청은 같은 분류 결과를 재사용
+    norm = " ".join(user_text.split()).lower()
+    return hashlib.blake2b(norm.encode("utf-8", "ignore"), digest_size=16).digest()
+
+
+# 명백한 요청은 Classifier(LLM) 호출 없이 규칙으로 분류
+# 한 카테고리만, 2회 이상 매칭될 때만 적용 (애매하면 LLM 에 맡김)
+# 예외: 단어 RULE_SHORT_WORDS 개 이하이고 첫 단어가 RULE_COMMANDS 의 명령 이름인
+#       입력("uptime", "df -h")은 1회 매칭으로 server_operation
+RULE_MIN_HITS = 2
+RULE_SHORT_WORDS = 3
+RULE_CONFIDENCE = 0.95
+
+RULE_COMMANDS = frozenset({
+    "ps", "df", "du", "free", "uptime", "systemctl", "journalctl",
+    "netstat", "ss", "dmesg", "lsblk", "iostat", "vmstat",
+})
+
+CLASSIFY_RULES = {
+    "server_operation": re.compile(
+        r"\b(?:ps|df|du|free|uptime|systemctl|journalctl|netstat|ss|dmesg|"
+        r"lsblk|iostat|vmstat|nginx|apache2?|docker)\b|재시작|점검|상태",
+        re.I
+    ),
+    "code_generation": re.compile(
+        r"```|\b(?:def|class|import)\s|스크립트|코드|작성",
+        re.I
+    ),
+    "explanatory": re.compile(
+        r"\b(?:explain|what\s+is|why|difference)\b|설명|뭐야|무엇|차이|원리|이유|개념",
+        re.I
+    ),
+}
+
+
+def classify_by_rule(user_text):
+    # 같은 키워드의 반복은 1회로 셈 (서로 다른 키워드 수)
+    hits = {
+        cat: len({m.lower() for m in pat.findall(user_text)})
+        for cat, pat in CLASSIFY_RULES.items()
+    }
+    matched = [cat for cat, n in hits.items() if n]
+    if len(matched) != 1:
+        return None
+
+    words = user_text.split()
+    short_command = (
+        matched[0] == "server_operation"
+        and len(words) <= RULE_SHORT_WORDS
+        and words[0].lower() in RULE_COMMANDS
+    )
+    if hits[matched[0]] < RULE_MIN_HITS and not short_command:
+        return None
+
+    return {
+        "category": matched[0],
+        "confidence": RULE_CONFIDENCE,
+        "needs_context": False,
+        "reason": "rule match"
+    }
+
+
 def classify(user_text):
+    ruled = classify_by_rule(user_text)
+    if ruled:
+        step("요청 분류 — 규칙 기반 (Classifier 생략)")
+        return ruled
+
+    load_classify_cache()
+    key = classify_key(user_text)
+
+    cached = cached_classification(key)
+    if cached is not None:
+        step("요청 분류 — 이전 결과 재사용")
+        return cached
+
     step("요청 분류 중… (Classifier 호출)")
 
     system_prompt = load_prompt("classifier.txt")
@@ -168,69 +570,356 @@ def classify(user_text):
         print("⚠️ Classifier 응답 JSON 파싱 실패 — unknown 처리")
         return {"category":"unknown","confidence":0.0,"needs_context":False,"reason":"parse failed"}
 
+    # 실패(fallback) 결과는 캐시하지 않음
+    if isinstance(result, dict):
+        cache_classified(key, result)
+        save_classify_cache()
+
     return result
 
 
+def cached_classification(key):
+    # 유효 기간이 지난 항목은 삭제하고 None
+    entry = _CLASSIFY_CACHE.get(key)
+    if entry is None:
+        return None
+
+    if time.time() - entry[0] >= CLASSIFY_CACHE_TTL:
+        del _CLASSIFY_CACHE[key]
+        return None
+
+    _CLASSIFY_CACHE.move_to_end(key)
+    return dict(entry[1])
+
+
+def cache_classified(key, result):
+    _CLASSIFY_CACHE[key] = (time.time(), dict(result))
+    if len(_CLASSIFY_CACHE) > CLASSIFY_CACHE_SIZE:
+        _CLASSIFY_CACHE.popitem(last=False)
+
+
+def classify_batch(texts):
+    """여러 요청을 Classifier 한 번의 호출로 분류 (입력 순서대로 결과 반환)"""
+    load_classify_cache()
+    keys = [classify_key(t) for t in texts]
+
+    # 규칙/캐시로 분류되지 않는 요청만 모아서 (중복 제거) 한 번에 분류
+    pending = {}
+    for k, t in zip(keys, texts):
+        if k in pending or cached_classification(k) is not None or classify_by_rule(t):
+            continue
+        pending[k] = t
+
+    if len(pending) > 1:
+        step(f"요청 {len(pending)}건 일괄 분류 중… (Classifier 호출)")
+
+        system_prompt = load_prompt("classifier.txt") + load_prompt("classifier_batch.txt")
+
+        try:
+            resp = ollama_client().chat(
+                model=MODEL_CLASSIFIER,
+                messages=[
+                    {"role":"system","content":system_prompt},
+                    {"role":"user","content":json.dumps(
+                        {"requests": list(pending.values())},
+                        ensure_ascii=False, separators=(",", ":")
+                    )}
+                ],
+                format="json",
+                stream=False
+            )
+            data = safe_json(resp["message"]["content"], {})
+        except Exception:
+            logger.error(traceback.format_exc())
+            data = {}
+
+        results = data.get("results") if isinstance(data, dict) else None
+
+        if isinstance(results, list) and len(results) == len(pending):
+            # 빈 결과/category 없는 결과는 캐시하지 않음 → 아래에서 개별 분류
+            for k, r in zip(pending, results):
+                if isinstance(r, dict) and r and "category" in r:
+                    cache_classified(k, r)
+            save_classify_cache()
+        else:
+            print("⚠️ 일괄 분류 응답 오류 — 요청별 분류로 전환")
+
+    # 캐시 적중분은 그대로, 누락분은 개별 분류
+    return [classify(t) for t in texts]
+
+
 ########################################
 # PLAN BUILDER
 ########################################
-def build_plan(category, rewritten, ctx):
+def valid_command(cmd):
+    # 명령은 비어 있지 않은 문자열 또는 문자열로만 된 비어 있지 않은 인자 배열
+    if isinstance(cmd, str):
+        return bool(cmd.strip())
+    return (isinstance(cmd, list) and bool(cmd)
+            and all(isinstance(a, str) for a in cmd))
+
+
+def valid_plan(res):
+    # 형식이 잘못된 명령이 하나라도 있으면 실행하지 않고 다음 모델로 대체
+    return (isinstance(res, dict) and isinstance(res.get("commands"), list)
+            and all(valid_command(c) for c in res["commands"]))
+
+
+def build_plan(category, rewritten, ctx, cancel=None, quiet=False):
     system_prompt = load_prompt("planner.txt")
     models = MODEL_CHAINS.get(category, MODEL_CHAINS["unknown"])
 
     return call_with_fallback(
         models,
         system_prompt,
-        {"rewritten_request": rewritten, "context": ctx}
+        {"rewritten_request": rewritten, "context": ctx},
+        speculative=HEDGED_FALLBACK,
+        validator=valid_plan,
+        cancel=cancel,
+        quiet=quiet
     )
 
 
 ########################################
 # REPORT
 ########################################
-def build_report(category, rewritten, ctx):
+def valid_report(res):
+    return isinstance(res, dict) and "summary" in res
+
+
+def build_report(category, rewritten, ctx, quiet=False):
     system_prompt = load_prompt("reporter.txt")
     models = MODEL_CHAINS.get(category, MODEL_CHAINS["unknown"])
 
     return call_with_fallback(
         models,
         system_prompt,
-        {"rewritten_request": rewritten, "context": ctx}
+        {"rewritten_request": rewritten, "context": ctx},
+        speculative=SPECULATIVE,
+        validator=valid_report,
+        quiet=quiet
     )
 
 
 ########################################
 # EXECUTION
 ########################################
+# 셸 기능(파이프, 리다이렉트, 변수, glob, 따옴표 등)이 필요한 명령 판별
+SHELL_METACHAR = re.compile(r"""[|&;<>()$`\\"'*?~{}\[\]#!\n]""")
+
+
+def popen(cmd):
+    # 명령마다 별도 세션(프로세스 그룹) → 시간 초과/중단 시 하위 프로세스까지 종료
+    # stdin 은 닫아 둠 → 입력을 기다리는 명령이 시간 초과까지 멈춰 있지 않음
+    opts = dict(
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+
+    # 인자 배열로 받은 명령과 단순 명령은 /bin/sh 를 거치지 않고 바로 exec
+    argv = None
+    if isinstance(cmd, list):
+        argv = [str(a) for a in cmd]
+    elif not SHELL_METACHAR.search(cmd):
+        argv = shlex.split(cmd)
+
+    if argv:
+        try:
+            return subprocess.Popen(argv, **opts)
+        except OSError:
+            # 실행 파일이 아닌 셸 builtin(cd, export 등) → 셸로 실행
+            pass
+
+    return subprocess.Popen(command_text(cmd), shell=True, **opts)
+
+
+def command_text(cmd):
+    # 결과/출력용 명령 문자열 (인자 배열은 셸에서 그대로 쓸 수 있게 quote)
+    if isinstance(cmd, list):
+        return shlex.join(str(a) for a in cmd)
+    return cmd
+
+
+def kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def read_output(proc, timeout):
+    """
+    stdout/stderr 를 MAX_OUTPUT_BYTES 까지만 보관하며 읽음
+    (초과분은 읽어서 버림 → 명령은 끝까지 실행, 메모리는 상한 고정)
+    반환: (stdout, stderr, truncated, timed_out)
+    """
+    bufs = {proc.stdout: bytearray(), proc.stderr: bytearray()}
+    truncated = False
+    timed_out = False
+    deadline = time.monotonic() + timeout
+
+    with selectors.DefaultSelector() as sel:
+        for f in bufs:
+            sel.register(f, selectors.EVENT_READ)
+
+        while sel.get_map() and not timed_out:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+
+            for key, _ in sel.select(remaining):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    continue
+
+                buf = bufs[key.fileobj]
+                room = MAX_OUTPUT_BYTES - len(buf)
+                if len(chunk) > room:
+                    truncated = True
+                if room > 0:
+                    buf += chunk[:room]
+
+    # 출력이 끝난 뒤에도 남은 시간 안에 종료되지 않으면 시간 초과
+    if not timed_out:
+        try:
+            proc.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            timed_out = True
+
+    if timed_out:
+        kill_group(proc)
+        proc.wait()
+
+    for f in bufs:
+        f.close()
+
+    return bytes(bufs[proc.stdout]), bytes(bufs[proc.stderr]), truncated, timed_out
+
+
+def run_command(cmd, running=None, abort=None, lock=None):
+    """
+    명령 1개 실행 (EXEC_TIMEOUT 초과 시 강제 종료)
+    running / abort / lock: parallel + fail_fast 중단용
+      - running: 실행 중인 Popen 을 등록할 set
+      - abort: 다른 명령이 실패하면 set 되는 Event
+      - lock: running 등록과 abort 확인을 묶는 Lock
+    """
+    # 이미 중단된 경우 시작하지 않음
+    if abort is not None and abort.is_set():
+        return skipped(cmd)
+
+    proc = popen(cmd)
+
+    if running is not None:
+        # 등록과 확인을 한 번에 → 중단 처리(kill) 직후 시작된 명령도 놓치지 않음
+        with lock:
+            running.add(proc)
+            aborted = abort.is_set()
+
+        if aborted:
+            kill_group(proc)
+            proc.communicate()
+            with lock:
+                running.discard(proc)
+            return skipped(cmd)
+
+    cmd = command_text(cmd)
+
+    try:
+        out, err, truncated, timed_out = read_output(proc, EXEC_TIMEOUT)
+    finally:
+        if running is not None:
+            with lock:
+                running.discard(proc)
+
+    # 다른 명령 실패로 강제 종료된 경우 (실패 원인이 아니므로 따로 표시)
+    aborted = abort is not None and abort.is_set() and proc.returncode != 0
+
+    # bytes 로 받아 strip 후 한 번만 decode
+    stdout = out.strip().decode("utf-8", "replace")
+    stderr = err.strip().decode("utf-8", "replace")
+
+    result = {
+        "command": cmd,
+        "returncode": proc.returncode,
+        "stdout": stdout,
+        "stderr": stderr
+    }
+
+    if truncated:
+        result["truncated"] = True
+
+    if aborted:
+        result["aborted"] = True
+        print(f"\n⛔ 다른 명령 실패로 중단: {cmd}")
+    elif timed_out:
+        result["timed_out"] = True
+        print(f"\n⏱ 시간 초과({EXEC_TIMEOUT}s) — 강제 종료: {cmd}")
+    elif proc.returncode != 0:
+        print(f"\n❌ 명령 실패: {cmd}")
+        print(f"stderr: {stderr}")
+
+    return result
+
+
+def skipped(cmd):
+    return {"command": command_text(cmd), "returncode": None, "stdout": "", "stderr": "", "skipped": True}
+
+
 def execute(plan):
     commands = plan.get("commands", [])
     if not commands:
         return {"mode":"NO_EXEC","description":"실행할 명령이 없습니다."}
 
-    results = []
-
     step("명령 실행 중…")
 
-    for cmd in commands:
-        proc = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True
-        )
-
-        result = {
-            "command": cmd,
-            "returncode": proc.returncode,
-            "stdout": proc.stdout.strip(),
-            "stderr": proc.stderr.strip()
-        }
-
-        if proc.returncode != 0:
-            print(f"\n❌ 명령 실패: {cmd}")
-            print(f"stderr: {proc.stderr.strip()}")
-
-        results.append(result)
+    # fail_fast: 하나라도 실패하면 남은 명령은 실행하지 않음
+    fail_fast = plan.get("fail_fast") is True
+
+    # planner 가 서로 독립적인 명령이라고 표시한 경우에만 동시 실행
+    # 결과 순서는 commands 순서 그대로 유지
+    if plan.get("parallel") is True and len(commands) > 1:
+        running = set()
+        abort = threading.Event()
+        lock = threading.Lock()
+        workers = min(len(commands), EXEC_CONCURRENCY)
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = [
+                ex.submit(run_command, cmd, running, abort, lock)
+                for cmd in commands
+            ]
+
+            for fut in as_completed(futures):
+                if fut.cancelled() or not fail_fast:
+                    continue
+                res = fut.result()
+                if res.get("skipped") or res.get("aborted") or res["returncode"] == 0:
+                    continue
+
+                # 중단 표시를 먼저 → 이후 시작하려는 명령은 스스로 건너뜀
+                with lock:
+                    abort.set()
+                    for proc in running:
+                        kill_group(proc)
+                for f in futures:
+                    f.cancel()
+
+        results = [
+            skipped(cmd) if fut.cancelled() else fut.result()
+            for cmd, fut in zip(commands, futures)
+        ]
+    else:
+        results = []
+        for i, cmd in enumerate(commands):
+            results.append(run_command(cmd))
+            if fail_fast and results[-1]["returncode"] != 0:
+                results += [skipped(c) for c in commands[i + 1:]]
+                break
 
     return {
         "mode":"EXECUTE",
@@ -254,6 +943,13 @@ def pretty_print(result):
 
         for r in result.get("results",[]):
             print(f"\n🔹 {r['command']}")
+            if r.get("skipped"):
+                print("⏭ 이전 명령 실패로 실행하지 않음")
+                continue
+            if r.get("aborted"):
+                print("⛔ 다른 명령 실패로 중단됨")
+            if r.get("timed_out"):
+                print(f"⏱ 시간 초과({EXEC_TIMEOUT}s)로 강제 종료")
             print(f"➡️ 코드: {r['returncode']}")
             if r['stdout']:
                 print(r['stdout'])
@@ -285,14 +981,23 @@ def pretty_print(result):
 ########################################
 # HANDLE USER INPUT
 ########################################
-def handle_input(text):
+def print_class(cls):
+    category = cls.get("category","unknown")
+    conf = cls.get("confidence",0.0)
+    print(f"\n📌 분류 결과 — category={category}, confidence={conf}")
 
-    cls = classify(text)
 
+def prepare(text, cls, speculative=None, quiet=False):
+    """
+    분류 결과에 맞는 보고서/실행계획 생성 (실행은 하지 않음)
+    speculative: SPECULATIVE_PLAN 체인으로 미리 요청해 둔 실행계획 Future
+    quiet: 분류 결과/진행 상황을 출력하지 않음 (여러 요청을 동시에 준비할 때)
+    """
     category = cls.get("category","unknown")
     conf = cls.get("confidence",0.0)
 
-    print(f"\n📌 분류 결과 — category={category}, confidence={conf}")
+    if not quiet:
+        print_class(cls)
 
     if conf < CONFIDENCE_THRESHOLD:
         category = "unknown"
@@ -303,15 +1008,83 @@ def handle_input(text):
     rewritten = text
 
     if category == "explanatory":
-        rep = build_report(category, rewritten, ctx)
-        pretty_print({"mode":"REPORT","report":rep})
-    else:
-        plan = build_plan(category, rewritten, ctx)
-        if not isinstance(plan,dict) or "commands" not in plan:
-            print("\n⚠️ 실행계획 JSON 구조 오류")
-            return
-        res = execute(plan)
-        pretty_print(res)
+        return "REPORT", build_report(category, rewritten, ctx, quiet=quiet)
+
+    models = MODEL_CHAINS.get(category, MODEL_CHAINS["unknown"])
+    if speculative is not None and models == MODEL_CHAINS[SPECULATIVE_PLAN]:
+        try:
+            plan = speculative.result()
+            if not quiet:
+                step("미리 요청한 실행계획 사용")
+            return "PLAN", plan
+        except Exception:
+            if not quiet:
+                step("⚠️ 미리 요청한 실행계획 실패 — 다시 요청")
+
+    return "PLAN", build_plan(category, rewritten, ctx, quiet=quiet)
+
+
+def finish(kind, body):
+    if kind == "REPORT":
+        pretty_print({"mode":"REPORT","report":body})
+        return
+
+    if not isinstance(body,dict) or "commands" not in body:
+        print("\n⚠️ 실행계획 JSON 구조 오류")
+        return
+    res = execute(body)
+    pretty_print(res)
+
+
+def handle_input(text):
+    # 분류가 규칙/캐시로 즉시 끝나는 경우에는 미리 요청할 이유가 없음
+    load_classify_cache()
+    if (not SPECULATIVE_PLAN or classify_by_rule(text)
+            or cached_classification(classify_key(text)) is not None):
+        finish(*prepare(text, classify(text)))
+        return
+
+    # 미리 요청은 조용히 (daemon 스레드 → 버려져도 프로세스 종료를 막지 않음)
+    cancel = threading.Event()
+    spec = spawn(build_plan, SPECULATIVE_PLAN, text, {}, cancel, True)
+    try:
+        kind, body = prepare(text, classify(text), speculative=spec)
+    finally:
+        # 사용하지 않은 계획 호출은 기다리지 않고 중단
+        cancel.set()
+    finish(kind, body)
+
+
+def handle_batch(texts):
+    """
+    stdin 으로 받은 여러 요청 처리
+    - 분류: Classifier 1회 호출
+    - 계획/보고서 생성: 동시 호출 (부작용 없음, 출력이 섞이지 않도록 조용히)
+    - 분류 결과/실행/출력: 입력 순서대로 순차 진행
+    """
+    classes = classify_batch(texts)
+
+    def safe_prepare(text, cls):
+        try:
+            return prepare(text, cls, quiet=True)
+        except Exception:
+            logger.error(traceback.format_exc())
+            return None
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as ex:
+        prepared = list(ex.map(safe_prepare, texts, classes))
+
+    for i, (text, cls, item) in enumerate(zip(texts, classes, prepared), 1):
+        print(f"\n🟨 [{i}/{len(texts)}] {text}")
+        print_class(cls)
+        if item is None:
+            print("\n❌ 처리 실패")
+            continue
+        try:
+            finish(*item)
+        except Exception:
+            logger.error(traceback.format_exc())
+            print("\n❌ 처리 실패")
 
 
 ########################################
@@ -319,21 +1092,69 @@ def handle_input(text):
 ########################################
 def run_as_service():
     logger.info("MCP Service Running…")
-    stop = False
+
+    # 신호가 올 때까지 주기적으로 깨어나지 않고 대기
+    stop = threading.Event()
 
     def sig(_sig,_frm):
-        nonlocal stop
-        stop = True
+        stop.set()
 
     signal.signal(signal.SIGINT,sig)
     signal.signal(signal.SIGTERM,sig)
 
-    while not stop:
-        time.sleep(1)
+    stop.wait()
 
     logger.info("MCP Service Exit")
 
 
+########################################
+# CLI HISTORY
+########################################
+HISTORY_SIZE = 1000
+
+
+def setup_history():
+    """
+    CLI 입력 기록(↑/↓) + Tab 으로 이전 요청 전체 문장 완성
+    이전 요청을 그대로 다시 쓰면 분류 캐시가 적중함
+    """
+    try:
+        import readline
+    except ImportError:
+        return
+
+    try:
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+    readline.set_history_length(HISTORY_SIZE)
+
+    def save():
+        try:
+            readline.write_history_file(HISTORY_FILE)
+        except OSError:
+            pass
+
+    atexit.register(save)
+
+    matches = []
+
+    def complete(text, state):
+        # 입력 줄 전체를 앞부분으로 보고 최근 기록부터 (중복 제외) 제안
+        if state == 0:
+            n = readline.get_current_history_length()
+            items = (readline.get_history_item(i) for i in range(n, 0, -1))
+            matches[:] = dict.fromkeys(
+                h for h in items
+                if h and h.startswith(text) and h not in ("quit", "exit")
+            )
+        return matches[state] if state < len(matches) else None
+
+    readline.set_completer_delims("")
+    readline.set_completer(complete)
+    readline.parse_and_bind("tab: complete")
+
+
 ########################################
 # MAIN
 ########################################
@@ -343,9 +1164,12 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--cli", action="store_true")
     parser.add_argument("--text", type=str)
+    parser.add_argument("--batch", action="store_true",
+                        help="stdin 의 요청을 한 줄에 하나씩 일괄 처리")
     args = parser.parse_args()
 
     if args.cli:
+        setup_history()
         print("=== MCP CLI MODE ===")
         while True:
             text = input("\nMCP> ").strip()
@@ -364,6 +1188,11 @@ def main():
             logger.error(traceback.format_exc())
             print("\n❌ 처리 실패")
 
+    elif args.batch:
+        texts = [l.strip() for l in sys.stdin.read().splitlines() if l.strip()]
+        if texts:
+            handle_batch(texts)
+
     else:
         run_as_service()
 
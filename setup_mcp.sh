@@ -10,6 +10,7 @@ VENV_DIR="$MCP_DIR/mcp-venv"
 REQ_FILE="$MCP_DIR/requirements.txt"
 ENV_FILE="/etc/mcp.env"
 SERVICE_FILE="/etc/systemd/system/mcp.service"
+LOGROTATE_FILE="/etc/logrotate.d/mcp"
 
 echo "======================================"
 echo " Linux Operations MCP Setup"
@@ -109,6 +110,22 @@ OOMScoreAdjust=-1000
 WantedBy=multi-user.target
 EOF
 
+# error.log 는 서비스/CLI 여러 프로세스가 append → 순환은 logrotate 가 담당
+# (copytruncate 없이 교체, 각 프로세스는 WatchedFileHandler 로 새 파일을 다시 엶)
+LOG_PATHS="$MCP_DIR/error.log"
+if [ "$MCP_DIR" != "/home/ubuntu/mcp" ]; then
+  LOG_PATHS="$LOG_PATHS /home/ubuntu/mcp/error.log"
+fi
+
+cat > "$LOGROTATE_FILE" <<EOF
+$LOG_PATHS {
+    size 5M
+    rotate 3
+    missingok
+    notifempty
+}
+EOF
+
 ########################################
 # 7️⃣ 서비스 활성화
 ########################################
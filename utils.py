@@ -1,12 +1,36 @@
-import json, time, traceback, subprocess
+import os, json, time, traceback, subprocess, logging
+from logging.handlers import WatchedFileHandler
 from pathlib import Path
 
 LOG = Path("/home/ubuntu/mcp/error.log")
 
-def log_error(msg: str):
-    LOG.parent.mkdir(parents=True, exist_ok=True)
-    with LOG.open("a") as f:
-        f.write(f"[{time.time()}] {msg}\n")
+class StampFormatter(logging.Formatter):
+    # 타임스탬프 문자열은 초가 바뀔 때만 다시 포맷
+    _sec = None
+    _stamp = ""
+
+    def formatTime(self, record, datefmt=None):
+        sec = int(record.created)
+        if sec != self._sec:
+            self._stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+            self._sec = sec
+        return self._stamp
+
+class LazyFileHandler(WatchedFileHandler):
+    # 첫 기록 시점에 로그 디렉터리 생성 (import 만으로는 아무것도 만들지 않음)
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+# 로그 파일은 첫 기록 때 열고 프로세스 종료 시까지 재사용
+# 여러 프로세스가 같은 파일에 append → 순환은 외부(logrotate)에서, 교체되면 다시 엶
+logger = logging.getLogger("mcp.utils")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+_handler = LazyFileHandler(LOG, delay=True)
+_handler.setFormatter(StampFormatter("[%(asctime)s] %(message)s"))
+logger.addHandler(_handler)
 
 def safe_read(path: Path, default):
     try:
@@ -14,28 +38,34 @@ def safe_read(path: Path, default):
             return default
         return json.loads(path.read_text())
     except Exception:
-        log_error(f"READ_FAIL {path}\n{traceback.format_exc()}")
+        logger.error(f"READ_FAIL {path}\n{traceback.format_exc()}")
         return default
 
 def safe_write(path: Path, data):
+    # 임시 파일에 쓴 뒤 교체 → 읽는 쪽이 쓰다 만 JSON 을 보지 않음
+    tmp = path.with_name(path.name + ".tmp")
     try:
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(data, indent=2))
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
     except Exception:
-        log_error(f"WRITE_FAIL {path}\n{traceback.format_exc()}")
+        logger.error(f"WRITE_FAIL {path}\n{traceback.format_exc()}")
 
-def safe_shell(cmd: str, timeout=30):
+def safe_shell(cmd, timeout=30):
+    # cmd 가 list 이면 /bin/sh 를 거치지 않고 바로 exec
+    shell = isinstance(cmd, str)
+    name = cmd if shell else " ".join(cmd)
     try:
         return subprocess.run(
             cmd,
-            shell=True,
+            shell=shell,
             capture_output=True,
             text=True,
             timeout=timeout
         )
     except subprocess.TimeoutExpired:
-        log_error(f"SHELL_TIMEOUT {cmd}")
+        logger.error(f"SHELL_TIMEOUT {name}")
         return None
     except Exception:
-        log_error(f"SHELL_FAIL {cmd}\n{traceback.format_exc()}")
+        logger.error(f"SHELL_FAIL {name}\n{traceback.format_exc()}")
         return None